@@ -1,413 +1,616 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask.json.provider import JSONProvider
+import copy
+import functools
+import hashlib
 import json
+import os
+import threading
+from collections import namedtuple
+from operator import attrgetter
 from typing import Dict, List, Set, Tuple
 import clips
+import orjson
+
+# msgspec 可用时 /assess 按已知模式一次 C 级解析并完成类型强制转换
+try:
+    import msgspec
+
+    class _AssessRequest(msgspec.Struct):
+        name: str = ''
+        responses: Dict[str, int] = {}
+
+    # strict=False 保持与 int() 后备路径一致：数字字符串（"4"）也接受
+    _ASSESS_DECODER = msgspec.json.Decoder(_AssessRequest, strict=False)
+except ImportError:
+    msgspec = None
+
+
+class OrjsonProvider(JSONProvider):
+    """JSON provider backed by orjson for faster /assess serialization"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
 # ===========================
 # CLIPS Expert System Integration
 # ===========================
 
+# 问卷题目 (question -> {value: symptom}) 映射，导入时扁平化为单层查找表
+SYMPTOM_MAPPING: Dict[str, Dict[int, str]] = {
+    'sleep_quality': {
+        4: 'poor_sleep',
+        5: 'poor_sleep'
+    },
+    'irritability': {
+        4: 'irritability',
+        5: 'irritability'
+    },
+    'study_load': {
+        4: 'deadline_pressure',
+        5: 'deadline_pressure'
+    },
+    'depression': {
+        4: 'persistent_fatigue',
+        5: 'persistent_fatigue'
+    },
+    'academic_performance': {
+        4: 'difficulty_concentrating',
+        5: 'difficulty_concentrating'
+    },
+    'basic_needs': {
+        4: 'skip_meals',
+        5: 'skip_meals'
+    },
+    'anxiety_level': {
+        4: 'racing_thoughts',
+        5: 'racing_thoughts'
+    },
+    'future_career_concerns': {
+        4: 'procrastination',
+        5: 'procrastination'
+    },
+    'social_support': {
+        1: 'social_withdrawal',
+        2: 'social_withdrawal'
+    },
+    'peer_pressure': {
+        1: 'minor_worry_only',
+        2: 'minor_worry_only'
+    }
+}
+
+# (question, value) -> symptom 的扁平查找表：每个回答只需一次哈希
+FLAT_SYMPTOMS: Dict[Tuple[str, int], str] = {
+    (question, value): symptom
+    for question, mapping in SYMPTOM_MAPPING.items()
+    for value, symptom in mapping.items()
+}
+
+# 推荐知识：CLIPS deffacts 与 Python 快速路径共用同一份数据
+_RECOMMENDATIONS = [
+    ("rec_breaks", "Take 5-10 minute breaks every hour of study.", "high"),
+    ("rec_counselor", "Consider discussing coping strategies with a counselor.", "high"),
+    ("rec_sleep", "Maintain regular sleep schedule, avoid screens 60 minutes before bed.", "high"),
+    ("rec_time_block", "Use time blocking for tasks with clear start and end times.", "high"),
+    ("rec_plan", "Plan 3-5 priority tasks weekly, break them into subtasks.", "moderate"),
+    ("rec_exercise", "Light exercise 3-4 times per week, 20-30 minutes each.", "moderate"),
+    ("rec_peer", "Study with peers or communicate regularly to reduce isolation.", "moderate"),
+    ("rec_monitor", "Maintain daily routine, record mood and sleep, review weekly.", "low")
+]
+
+# CLIPS 规则集的纯 Python 编译版：十来条确定性规则用不上 Rete，
+# 直接用集合包含判断即可。每条规则为 (前提症状集, 规则名, 解释)
+_HIGH_RISK_RULES = (
+    ({'poor_sleep', 'irritability', 'deadline_pressure'},
+     "high-stress-symptom-1", "Poor sleep, irritability, and deadline pressure detected"),
+    ({'persistent_fatigue', 'difficulty_concentrating'},
+     "high-stress-symptom-2", "Persistent fatigue and difficulty concentrating"),
+    ({'skip_meals', 'racing_thoughts'},
+     "high-stress-symptom-3", "Skipping meals and racing thoughts detected"),
+)
+
+_MODERATE_RISK_RULES = (
+    ({'procrastination', 'deadline_pressure'},
+     "moderate-stress-symptom-1", "Procrastination with deadline pressure"),
+    ({'social_withdrawal', 'irritability'},
+     "moderate-stress-symptom-2", "Social withdrawal and irritability"),
+)
+
+_LOW_RISK_RULES = (
+    ({'minor_worry_only'}, "low-stress-symptom", "Only minor worries detected"),
+)
+
+# 等级优先级/展示名/初始症状白名单：模块级常量，避免逐事实、逐请求重建
+_LEVEL_PRIORITY = {
+    "very_high": 4,
+    "high": 3,
+    "moderate": 2,
+    "low": 1,
+    "high_risk": 4,
+    "moderate_risk": 3,
+    "low_risk": 2
+}
+
+_LEVEL_DISPLAY = {
+    "Very_High": "Very High",
+    "High": "High",
+    "Moderate": "Moderate",
+    "Low": "Low"
+}
+
+# es_result 等级 -> 展示名：查表替代 replace('_risk', '').title() 的两次字符串分配
+_LEVEL_NORMALIZE = {
+    "very_high": "Very High",
+    "high": "High",
+    "moderate": "Moderate",
+    "low": "Low",
+    "high_risk": "High",
+    "moderate_risk": "Moderate",
+    "low_risk": "Low"
+}
+
+# 列式症状布局：十个症状压进一个 symptoms 事实的 multislot，位置固定
+_SYMPTOM_ORDER = (
+    'poor_sleep', 'irritability', 'deadline_pressure', 'persistent_fatigue',
+    'difficulty_concentrating', 'skip_meals', 'racing_thoughts',
+    'procrastination', 'social_withdrawal', 'minor_worry_only',
+)
+
+# 设置 USE_CLIPS=1 时仍走 CLIPS 引擎，便于对快速路径做 A/B 校验
+USE_CLIPS = bool(os.environ.get('USE_CLIPS'))
+
+
+def evaluate_fast(responses: Dict[str, int]) -> Dict[str, object]:
+    """Pure-Python decision function mirroring the CLIPS rule set"""
+    detected = [
+        symptom for symptom in map(FLAT_SYMPTOMS.get, responses.items())
+        if symptom is not None
+    ]
+    symptoms = set(detected)
+
+    results = {
+        "stress_level": "Undetermined",
+        "overall_score": 0.0,
+        "rules_triggered": [],
+        "explanations": [],
+        "recommendations": [],
+        "symptoms_detected": detected,
+        "initial_symptoms": list(detected)
+    }
+
+    # 症状评估层：高压指标抑制中压，中压抑制低压（同 CLIPS 里的 not 条件）
+    es_results = []
+    overall = None
+    for premises, rule, explanation in _HIGH_RISK_RULES:
+        if premises <= symptoms:
+            es_results.append(("high_risk", rule, explanation))
+    if es_results:
+        overall = 4.0
+        es_results.append(("very_high", "overall-high-stress",
+                           "Multiple high stress indicators present"))
+    else:
+        for premises, rule, explanation in _MODERATE_RISK_RULES:
+            if premises <= symptoms:
+                es_results.append(("moderate_risk", rule, explanation))
+        if es_results:
+            overall = 2.5
+            es_results.append(("moderate", "overall-moderate-stress",
+                               "Moderate stress indicators present"))
+        else:
+            for premises, rule, explanation in _LOW_RISK_RULES:
+                if premises <= symptoms:
+                    es_results.append(("low_risk", rule, explanation))
+            if es_results:
+                overall = 1.5
+                es_results.append(("low", "overall-low-stress",
+                                   "Only low stress indicators present"))
+
+    # 基于分数的后备层：仅当症状层没有给出 overall 时生效
+    total_score = sum(responses.values())
+    max_score = len(responses) * 5
+    if overall is None and max_score > 0:
+        score_ratio = total_score / max_score
+        if score_ratio > 0.8:
+            overall = 4.0
+            es_results.append(("very_high", "fallback-score-very-high", "Based on total score > 80%"))
+        elif score_ratio > 0.6:
+            overall = 3.0
+            es_results.append(("high", "fallback-score-high", "Based on total score 60-80%"))
+        elif score_ratio > 0.4:
+            overall = 2.0
+            es_results.append(("moderate", "fallback-score-moderate", "Based on total score 40-60%"))
+        else:
+            overall = 1.0
+            es_results.append(("low", "fallback-score-low", "Based on total score <= 40%"))
+
+    # 数值范围层：根据 overall 分数再补一条 es_result
+    if overall is not None:
+        results["overall_score"] = overall
+        if overall >= 4.0:
+            es_results.append(("very_high", "rule-very-high-overall", "Overall stress score >= 4.0"))
+        elif overall >= 3.0:
+            es_results.append(("high", "rule-high-overall", "Overall stress score 3.0-3.99"))
+        elif overall >= 2.0:
+            es_results.append(("moderate", "rule-moderate-overall", "Overall stress score 2.0-2.99"))
+        else:
+            es_results.append(("low", "rule-low-overall", "Overall stress score < 2.0"))
+
+    # 汇总：取优先级最高的等级
+    best_priority = 0
+    for level, rule, explanation in es_results:
+        results["rules_triggered"].append(rule)
+        results["explanations"].append(explanation)
+        priority = _LEVEL_PRIORITY.get(level, 0)
+        # 同级时取后出现的结论（overall 层在 risk 层之后，very_high 覆盖 high_risk）
+        if priority >= best_priority and priority > 0:
+            best_priority = priority
+            results["stress_level"] = _LEVEL_NORMALIZE.get(level, level)
+
+    # 获取推荐（与 CLIPS 路径相同的宽松匹配）
+    stress_level_lower = results["stress_level"].lower()
+    for rec_id, text, rec_level in _RECOMMENDATIONS:
+        if rec_level in stress_level_lower or stress_level_lower in rec_level:
+            results["recommendations"].append(text)
+
+    # 如果未确定等级，使用后备逻辑
+    if results["stress_level"] == "Undetermined":
+        score_ratio = total_score / max_score if max_score > 0 else 0
+        if score_ratio > 0.8:
+            results["stress_level"] = "Very High"
+        elif score_ratio > 0.6:
+            results["stress_level"] = "High"
+        elif score_ratio > 0.4:
+            results["stress_level"] = "Moderate"
+        else:
+            results["stress_level"] = "Low"
+
+    return results
+
+
+@functools.lru_cache(maxsize=4096)
+def _evaluate_fast_cached(responses_key: Tuple[Tuple[str, int], ...]) -> Dict[str, object]:
+    return evaluate_fast(dict(responses_key))
+
+
+# 编译后的知识库二进制镜像：bload 跳过规则文本解析与 Rete 构建
+# 全部 CLIPS 构造文本（模板 / 推荐 deffacts / 规则）集中成数据：
+# 编译镜像按这些文本的哈希取名，规则一改旧镜像即失效
+_KB_CONSTRUCTS: Tuple[str, ...] = (
+    # 定义症状模板（指标事实仍逐个断言）
+    """
+    (deftemplate symptom
+        (slot name (type STRING))
+        (slot value (type INTEGER)))
+    """,
+
+    # 列式症状事实：十个 0/1 标志按 _SYMPTOM_ORDER 固定位置放进一个 multislot，
+    # 所有症状规则共享这一个 alpha 结点，不再做跨事实 join
+    """
+    (deftemplate symptoms
+        (multislot flags (type INTEGER)))
+    """,
+    
+    # 定义指标模板
+    """
+    (deftemplate metric
+        (slot name (type STRING))
+        (slot value (type FLOAT)))
+    """,
+    
+    # 定义专家系统结果模板
+    """
+    (deftemplate es_result
+        (slot level (type STRING))
+        (slot rule (type STRING))
+        (slot explanation (type STRING)))
+    """,
+    
+    # 定义推荐模板
+    """
+    (deftemplate recommendation
+        (slot id (type STRING))
+        (slot text (type STRING))
+        (slot for_level (type STRING)))
+    """,
+    
+    # 用 deffacts 声明推荐：reset 后自动重新断言，且包含在二进制镜像里
+    "(deffacts recommendations\n" + "\n".join(
+        f'(recommendation (id "{rec_id}") (text "{text}") (for_level "{level}"))'
+        for rec_id, text, level in _RECOMMENDATIONS
+    ) + ")",
+    
+    # ==================== 症状评估规则 ====================
+    
+    # 规则1: 睡眠质量差 + 易怒 + 截止日期压力 → 高压症状
+    """
+    (defrule high-stress-symptom-1
+        (symptoms (flags ?ps ?ir ?dl $?))
+        (test (and (= ?ps 1) (= ?ir 1) (= ?dl 1)))
+        =>
+        (assert (symptom (name "stress_high_indicator") (value 1)))
+        (assert (es_result 
+            (level "high_risk") 
+            (rule "high-stress-symptom-1")
+            (explanation "Poor sleep, irritability, and deadline pressure detected")))
+    )
+    """,
+    
+    # 规则2: 持续疲劳 + 注意力不集中 → 高压症状
+    """
+    (defrule high-stress-symptom-2
+        (symptoms (flags ? ? ? ?pf ?dc $?))
+        (test (and (= ?pf 1) (= ?dc 1)))
+        =>
+        (assert (symptom (name "stress_high_indicator") (value 1)))
+        (assert (es_result 
+            (level "high_risk") 
+            (rule "high-stress-symptom-2")
+            (explanation "Persistent fatigue and difficulty concentrating")))
+    )
+    """,
+    
+    # 规则3: 不吃饭 + 思绪纷乱 → 高压症状
+    """
+    (defrule high-stress-symptom-3
+        (symptoms (flags ? ? ? ? ? ?sm ?rt $?))
+        (test (and (= ?sm 1) (= ?rt 1)))
+        =>
+        (assert (symptom (name "stress_high_indicator") (value 1)))
+        (assert (es_result 
+            (level "high_risk") 
+            (rule "high-stress-symptom-3")
+            (explanation "Skipping meals and racing thoughts detected")))
+    )
+    """,
+    
+    # 规则4: 拖延 + 截止日期压力 → 中度压力
+    """
+    (defrule moderate-stress-symptom-1
+        (symptoms (flags ? ? ?dl ? ? ? ? ?pr $?))
+        (test (and (= ?pr 1) (= ?dl 1)))
+        (not (symptom (name "stress_high_indicator") (value ?v)))
+        =>
+        (assert (symptom (name "stress_moderate_indicator") (value 1)))
+        (assert (es_result 
+            (level "moderate_risk") 
+            (rule "moderate-stress-symptom-1")
+            (explanation "Procrastination with deadline pressure")))
+    )
+    """,
+    
+    # 规则5: 社交退缩 + 易怒 → 中度压力
+    """
+    (defrule moderate-stress-symptom-2
+        (symptoms (flags ? ?ir ? ? ? ? ? ? ?sw ?))
+        (test (and (= ?sw 1) (= ?ir 1)))
+        (not (symptom (name "stress_high_indicator") (value ?v)))
+        =>
+        (assert (symptom (name "stress_moderate_indicator") (value 1)))
+        (assert (es_result 
+            (level "moderate_risk") 
+            (rule "moderate-stress-symptom-2")
+            (explanation "Social withdrawal and irritability")))
+    )
+    """,
+    
+    # 规则6: 轻度担忧 → 低压
+    """
+    (defrule low-stress-symptom
+        (symptoms (flags ? ? ? ? ? ? ? ? ? ?mw))
+        (test (= ?mw 1))
+        (not (symptom (name "stress_high_indicator") (value ?v)))
+        (not (symptom (name "stress_moderate_indicator") (value ?v)))
+        =>
+        (assert (symptom (name "stress_low_indicator") (value 1)))
+        (assert (es_result 
+            (level "low_risk") 
+            (rule "low-stress-symptom")
+            (explanation "Only minor worries detected")))
+    )
+    """,
+    
+    # ==================== 总体压力等级规则 ====================
+    
+    # 规则: 存在高压指标 → 总体高压
+    """
+    (defrule overall-high-stress
+        (symptom (name "stress_high_indicator") (value ?v&:(>= ?v 1)))
+        =>
+        (assert (metric (name "overall") (value 4.0)))
+        (assert (es_result 
+            (level "very_high") 
+            (rule "overall-high-stress")
+            (explanation "Multiple high stress indicators present")))
+    )
+    """,
+    
+    # 规则: 存在中度压力指标 → 总体中度
+    """
+    (defrule overall-moderate-stress
+        (symptom (name "stress_moderate_indicator") (value ?v&:(>= ?v 1)))
+        (not (symptom (name "stress_high_indicator") (value ?v2)))
+        =>
+        (assert (metric (name "overall") (value 2.5)))
+        (assert (es_result 
+            (level "moderate") 
+            (rule "overall-moderate-stress")
+            (explanation "Moderate stress indicators present")))
+    )
+    """,
+    
+    # 规则: 存在低压指标 → 总体低压
+    """
+    (defrule overall-low-stress
+        (symptom (name "stress_low_indicator") (value ?v&:(>= ?v 1)))
+        (not (symptom (name "stress_high_indicator") (value ?v2)))
+        (not (symptom (name "stress_moderate_indicator") (value ?v3)))
+        =>
+        (assert (metric (name "overall") (value 1.5)))
+        (assert (es_result 
+            (level "low") 
+            (rule "overall-low-stress")
+            (explanation "Only low stress indicators present")))
+    )
+    """,
+    
+    # ==================== 基于分数的后备规则 ====================
+
+    # 后备规则折叠为一条：共享 total/max/not-overall 的 join 链，
+    # 分数比值只算一次，RHS 里一次分支定级。负 salience 保证症状规则
+    # 先有机会断言 overall，后备层只在没有任何 overall 时兜底（与快速路径一致）
+    """
+    (defrule fallback-classify
+        (declare (salience -10))
+        (metric (name "total_score") (value ?tv))
+        (metric (name "max_score") (value ?mv))
+        (not (metric (name "overall")))
+        =>
+        (bind ?ratio (/ ?tv ?mv))
+        (if (> ?ratio 0.8)
+         then (assert (metric (name "overall") (value 4.0)))
+              (assert (es_result
+                  (level "very_high")
+                  (rule "fallback-score-very-high")
+                  (explanation "Based on total score > 80%")))
+         else (if (> ?ratio 0.6)
+          then (assert (metric (name "overall") (value 3.0)))
+               (assert (es_result
+                   (level "high")
+                   (rule "fallback-score-high")
+                   (explanation "Based on total score 60-80%")))
+          else (if (> ?ratio 0.4)
+           then (assert (metric (name "overall") (value 2.0)))
+                (assert (es_result
+                    (level "moderate")
+                    (rule "fallback-score-moderate")
+                    (explanation "Based on total score 40-60%")))
+           else (assert (metric (name "overall") (value 1.0)))
+                (assert (es_result
+                    (level "low")
+                    (rule "fallback-score-low")
+                    (explanation "Based on total score <= 40%"))))))
+    )
+    """,
+    
+    # ==================== 基于数值范围的规则 ====================
+    
+    # 四条范围规则共享同一个 (metric overall) alpha 结点，折叠成一条，
+    # RHS 里算一次分支；es_result 的 rule 槽保留原来的规则名
+    """
+    (defrule overall-classify
+        (metric (name "overall") (value ?v))
+        =>
+        (if (>= ?v 4.0)
+         then (assert (es_result
+                  (level "very_high")
+                  (rule "rule-very-high-overall")
+                  (explanation "Overall stress score >= 4.0")))
+         else (if (>= ?v 3.0)
+          then (assert (es_result
+                   (level "high")
+                   (rule "rule-high-overall")
+                   (explanation "Overall stress score 3.0-3.99")))
+          else (if (>= ?v 2.0)
+           then (assert (es_result
+                    (level "moderate")
+                    (rule "rule-moderate-overall")
+                    (explanation "Overall stress score 2.0-2.99")))
+           else (assert (es_result
+                    (level "low")
+                    (rule "rule-low-overall")
+                    (explanation "Overall stress score < 2.0"))))))
+    )
+    """,
+)
+
+# 镜像文件名带内容哈希：旧镜像不会静默遮蔽新规则文本
+_KB_HASH = hashlib.sha1("\n".join(_KB_CONSTRUCTS).encode("utf-8")).hexdigest()[:12]
+_COMPILED_KB = os.path.join(os.path.dirname(os.path.abspath(__file__)), f'kb-{_KB_HASH}.bin')
+
+
 class CLIPSExpertSystem:
     def __init__(self):
         self.env = clips.Environment()
+        # CLIPS 环境非线程安全，Flask 多线程下需要串行化访问
+        self._lock = threading.Lock()
         self.setup_knowledge_base()
-    
+        # 一次性 reset 断言 deffacts 里的推荐事实；此后按请求增量撤销，不再整环境 reset
+        self.env.reset()
+        # 缓存模板句柄：assert_fact 直接建事实，绕开 CLIPS 词法/语法解析
+        self._symptoms_tmpl = self.env.find_template("symptoms")
+        self._metric_tmpl = self.env.find_template("metric")
+
     def setup_knowledge_base(self):
         """Initialize CLIPS environment with rules and templates"""
-        
-        # 定义症状模板
-        self.env.build("""
-        (deftemplate symptom
-            (slot name (type STRING))
-            (slot value (type INTEGER)))
-        """)
-        
-        # 定义指标模板
-        self.env.build("""
-        (deftemplate metric
-            (slot name (type STRING))
-            (slot value (type FLOAT)))
-        """)
-        
-        # 定义专家系统结果模板
-        self.env.build("""
-        (deftemplate es_result
-            (slot level (type STRING))
-            (slot rule (type STRING))
-            (slot explanation (type STRING)))
-        """)
-        
-        # 定义推荐模板
-        self.env.build("""
-        (deftemplate recommendation
-            (slot id (type STRING))
-            (slot text (type STRING))
-            (slot for_level (type STRING)))
-        """)
-        
-        # 添加推荐事实
-        recommendations = [
-            ("rec_breaks", "Take 5-10 minute breaks every hour of study.", "high"),
-            ("rec_counselor", "Consider discussing coping strategies with a counselor.", "high"),
-            ("rec_sleep", "Maintain regular sleep schedule, avoid screens 60 minutes before bed.", "high"),
-            ("rec_time_block", "Use time blocking for tasks with clear start and end times.", "high"),
-            ("rec_plan", "Plan 3-5 priority tasks weekly, break them into subtasks.", "moderate"),
-            ("rec_exercise", "Light exercise 3-4 times per week, 20-30 minutes each.", "moderate"),
-            ("rec_peer", "Study with peers or communicate regularly to reduce isolation.", "moderate"),
-            ("rec_monitor", "Maintain daily routine, record mood and sleep, review weekly.", "low")
-        ]
-        
-        for rec_id, text, level in recommendations:
-            self.env.assert_string(f'(recommendation (id "{rec_id}") (text "{text}") (for_level "{level}"))')
-        
-        # ==================== 症状评估规则 ====================
-        
-        # 规则1: 睡眠质量差 + 易怒 + 截止日期压力 → 高压症状
-        self.env.build("""
-        (defrule high-stress-symptom-1
-            (symptom (name "poor_sleep") (value ?v1&:(>= ?v1 1)))
-            (symptom (name "irritability") (value ?v2&:(>= ?v2 1)))
-            (symptom (name "deadline_pressure") (value ?v3&:(>= ?v3 1)))
-            =>
-            (assert (symptom (name "stress_high_indicator") (value 1)))
-            (assert (es_result 
-                (level "high_risk") 
-                (rule "high-stress-symptom-1")
-                (explanation "Poor sleep, irritability, and deadline pressure detected")))
-        )
-        """)
-        
-        # 规则2: 持续疲劳 + 注意力不集中 → 高压症状
-        self.env.build("""
-        (defrule high-stress-symptom-2
-            (symptom (name "persistent_fatigue") (value ?v1&:(>= ?v1 1)))
-            (symptom (name "difficulty_concentrating") (value ?v2&:(>= ?v2 1)))
-            =>
-            (assert (symptom (name "stress_high_indicator") (value 1)))
-            (assert (es_result 
-                (level "high_risk") 
-                (rule "high-stress-symptom-2")
-                (explanation "Persistent fatigue and difficulty concentrating")))
-        )
-        """)
-        
-        # 规则3: 不吃饭 + 思绪纷乱 → 高压症状
-        self.env.build("""
-        (defrule high-stress-symptom-3
-            (symptom (name "skip_meals") (value ?v1&:(>= ?v1 1)))
-            (symptom (name "racing_thoughts") (value ?v2&:(>= ?v2 1)))
-            =>
-            (assert (symptom (name "stress_high_indicator") (value 1)))
-            (assert (es_result 
-                (level "high_risk") 
-                (rule "high-stress-symptom-3")
-                (explanation "Skipping meals and racing thoughts detected")))
-        )
-        """)
-        
-        # 规则4: 拖延 + 截止日期压力 → 中度压力
-        self.env.build("""
-        (defrule moderate-stress-symptom-1
-            (symptom (name "procrastination") (value ?v1&:(>= ?v1 1)))
-            (symptom (name "deadline_pressure") (value ?v2&:(>= ?v2 1)))
-            (not (symptom (name "stress_high_indicator") (value ?v)))
-            =>
-            (assert (symptom (name "stress_moderate_indicator") (value 1)))
-            (assert (es_result 
-                (level "moderate_risk") 
-                (rule "moderate-stress-symptom-1")
-                (explanation "Procrastination with deadline pressure")))
-        )
-        """)
-        
-        # 规则5: 社交退缩 + 易怒 → 中度压力
-        self.env.build("""
-        (defrule moderate-stress-symptom-2
-            (symptom (name "social_withdrawal") (value ?v1&:(>= ?v1 1)))
-            (symptom (name "irritability") (value ?v2&:(>= ?v2 1)))
-            (not (symptom (name "stress_high_indicator") (value ?v)))
-            =>
-            (assert (symptom (name "stress_moderate_indicator") (value 1)))
-            (assert (es_result 
-                (level "moderate_risk") 
-                (rule "moderate-stress-symptom-2")
-                (explanation "Social withdrawal and irritability")))
-        )
-        """)
-        
-        # 规则6: 轻度担忧 → 低压
-        self.env.build("""
-        (defrule low-stress-symptom
-            (symptom (name "minor_worry_only") (value ?v1&:(>= ?v1 1)))
-            (not (symptom (name "stress_high_indicator") (value ?v)))
-            (not (symptom (name "stress_moderate_indicator") (value ?v)))
-            =>
-            (assert (symptom (name "stress_low_indicator") (value 1)))
-            (assert (es_result 
-                (level "low_risk") 
-                (rule "low-stress-symptom")
-                (explanation "Only minor worries detected")))
-        )
-        """)
-        
-        # ==================== 总体压力等级规则 ====================
-        
-        # 规则: 存在高压指标 → 总体高压
-        self.env.build("""
-        (defrule overall-high-stress
-            (symptom (name "stress_high_indicator") (value ?v&:(>= ?v 1)))
-            =>
-            (assert (metric (name "overall") (value 4.0)))
-            (assert (es_result 
-                (level "very_high") 
-                (rule "overall-high-stress")
-                (explanation "Multiple high stress indicators present")))
-        )
-        """)
-        
-        # 规则: 存在中度压力指标 → 总体中度
-        self.env.build("""
-        (defrule overall-moderate-stress
-            (symptom (name "stress_moderate_indicator") (value ?v&:(>= ?v 1)))
-            (not (symptom (name "stress_high_indicator") (value ?v2)))
-            =>
-            (assert (metric (name "overall") (value 2.5)))
-            (assert (es_result 
-                (level "moderate") 
-                (rule "overall-moderate-stress")
-                (explanation "Moderate stress indicators present")))
-        )
-        """)
-        
-        # 规则: 存在低压指标 → 总体低压
-        self.env.build("""
-        (defrule overall-low-stress
-            (symptom (name "stress_low_indicator") (value ?v&:(>= ?v 1)))
-            (not (symptom (name "stress_high_indicator") (value ?v2)))
-            (not (symptom (name "stress_moderate_indicator") (value ?v3)))
-            =>
-            (assert (metric (name "overall") (value 1.5)))
-            (assert (es_result 
-                (level "low") 
-                (rule "overall-low-stress")
-                (explanation "Only low stress indicators present")))
-        )
-        """)
-        
-        # ==================== 基于分数的后备规则 ====================
-        
-        # 创建全局变量来跟踪总体分数是否已设置
-        self.env.build("""
-        (deftemplate overall_set
-            (slot is_set (type SYMBOL) (allowed-symbols TRUE FALSE))
-        )
-        """)
-        
-        # 修复后备规则：使用更好的方法检查事实是否存在
-        # 方案1: 使用一个标记事实来跟踪
-        self.env.build("""
-        (defrule check-overall-not-set
-            (not (metric (name "overall")))
-            =>
-            (assert (overall_set (is_set FALSE)))
-        )
-        """)
-        
-        self.env.build("""
-        (defrule check-overall-set
-            (metric (name "overall"))
-            =>
-            (assert (overall_set (is_set TRUE)))
-        )
-        """)
-        
-        # 修复后的后备规则：使用not模式
-        self.env.build("""
-        (defrule fallback-very-high-stress
-            (metric (name "total_score") (value ?tv))
-            (metric (name "max_score") (value ?mv))
-            (not (metric (name "overall")))
-            (test (> (/ ?tv ?mv) 0.8))
-            =>
-            (assert (metric (name "overall") (value 4.0)))
-            (assert (es_result 
-                (level "very_high") 
-                (rule "fallback-score-very-high")
-                (explanation "Based on total score > 80%")))
-        )
-        """)
-        
-        self.env.build("""
-        (defrule fallback-high-stress
-            (metric (name "total_score") (value ?tv))
-            (metric (name "max_score") (value ?mv))
-            (not (metric (name "overall")))
-            (test (and (> (/ ?tv ?mv) 0.6) (<= (/ ?tv ?mv) 0.8)))
-            =>
-            (assert (metric (name "overall") (value 3.0)))
-            (assert (es_result 
-                (level "high") 
-                (rule "fallback-score-high")
-                (explanation "Based on total score 60-80%")))
-        )
-        """)
-        
-        self.env.build("""
-        (defrule fallback-moderate-stress
-            (metric (name "total_score") (value ?tv))
-            (metric (name "max_score") (value ?mv))
-            (not (metric (name "overall")))
-            (test (and (> (/ ?tv ?mv) 0.4) (<= (/ ?tv ?mv) 0.6)))
-            =>
-            (assert (metric (name "overall") (value 2.0)))
-            (assert (es_result 
-                (level "moderate") 
-                (rule "fallback-score-moderate")
-                (explanation "Based on total score 40-60%")))
-        )
-        """)
-        
-        self.env.build("""
-        (defrule fallback-low-stress
-            (metric (name "total_score") (value ?tv))
-            (metric (name "max_score") (value ?mv))
-            (not (metric (name "overall")))
-            (test (<= (/ ?tv ?mv) 0.4))
-            =>
-            (assert (metric (name "overall") (value 1.0)))
-            (assert (es_result 
-                (level "low") 
-                (rule "fallback-score-low")
-                (explanation "Based on total score <= 40%")))
-        )
-        """)
-        
-        # 方案2: 创建自定义函数（更高级的解决方案）
-        # 首先定义自定义函数
+
+        # 已有与当前构造文本哈希匹配的镜像时直接加载；损坏则走完整重建
+        if os.path.exists(_COMPILED_KB):
+            try:
+                self.env.load(_COMPILED_KB, binary=True)
+                return
+            except clips.CLIPSError:
+                pass
+
+        for construct in _KB_CONSTRUCTS:
+            self.env.build(construct)
+
+        # 先写线程私有的临时文件再原子替换，并发冷启动不会读到半成品镜像
+        tmp_path = f"{_COMPILED_KB}.{os.getpid()}.{threading.get_ident()}.tmp"
         try:
-            # 创建一个检查事实是否存在的函数
-            self.env.build("""
-            (deffunction overall-metric-exists ()
-                (find-fact ((?f metric)) (eq ?f:name "overall"))
-            )
-            """)
-        except:
-            # 如果自定义函数创建失败，使用模式匹配方法
-            print("Note: Using pattern matching instead of custom function")
-        
-        # ==================== 基于数值范围的规则 ====================
-        
-        self.env.build("""
-        (defrule rule-very-high-overall
-            (metric (name "overall") (value ?v))
-            (test (>= ?v 4.0))
-            =>
-            (assert (es_result 
-                (level "very_high") 
-                (rule "rule-very-high-overall")
-                (explanation "Overall stress score >= 4.0")))
-        )
-        """)
-        
-        self.env.build("""
-        (defrule rule-high-overall
-            (metric (name "overall") (value ?v))
-            (test (and (>= ?v 3.0) (< ?v 4.0)))
-            =>
-            (assert (es_result 
-                (level "high") 
-                (rule "rule-high-overall")
-                (explanation "Overall stress score 3.0-3.99")))
-        )
-        """)
-        
-        self.env.build("""
-        (defrule rule-moderate-overall
-            (metric (name "overall") (value ?v))
-            (test (and (>= ?v 2.0) (< ?v 3.0)))
-            =>
-            (assert (es_result 
-                (level "moderate") 
-                (rule "rule-moderate-overall")
-                (explanation "Overall stress score 2.0-2.99")))
-        )
-        """)
-        
-        self.env.build("""
-        (defrule rule-low-overall
-            (metric (name "overall") (value ?v))
-            (test (< ?v 2.0))
-            =>
-            (assert (es_result 
-                (level "low") 
-                (rule "rule-low-overall")
-                (explanation "Overall stress score < 2.0")))
-        )
-        """)
-    
+            self.env.save(tmp_path, binary=True)
+            os.replace(tmp_path, _COMPILED_KB)
+            # 文件名带哈希：规则一改旧镜像只会积灰，替换成功后顺手清掉
+            kb_dir = os.path.dirname(_COMPILED_KB)
+            for stale in os.listdir(kb_dir):
+                stale_path = os.path.join(kb_dir, stale)
+                if (stale.startswith('kb-') and stale.endswith('.bin')
+                        and stale_path != _COMPILED_KB):
+                    try:
+                        os.remove(stale_path)
+                    except OSError:
+                        pass
+        except (clips.CLIPSError, OSError):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
     def evaluate_responses(self, responses: Dict[str, int]) -> Dict[str, object]:
-        """Evaluate stress using CLIPS expert system"""
-        
-        # 重置环境
-        self.env.reset()
-        
-        # 转换响应为症状事实
-        symptom_mapping = {
-            'sleep_quality': {
-                4: 'poor_sleep',
-                5: 'poor_sleep'
-            },
-            'irritability': {
-                4: 'irritability',
-                5: 'irritability'
-            },
-            'study_load': {
-                4: 'deadline_pressure',
-                5: 'deadline_pressure'
-            },
-            'depression': {
-                4: 'persistent_fatigue',
-                5: 'persistent_fatigue'
-            },
-            'academic_performance': {
-                4: 'difficulty_concentrating',
-                5: 'difficulty_concentrating'
-            },
-            'basic_needs': {
-                4: 'skip_meals',
-                5: 'skip_meals'
-            },
-            'anxiety_level': {
-                4: 'racing_thoughts',
-                5: 'racing_thoughts'
-            },
-            'future_career_concerns': {
-                4: 'procrastination',
-                5: 'procrastination'
-            },
-            'social_support': {
-                1: 'social_withdrawal',
-                2: 'social_withdrawal'
-            },
-            'peer_pressure': {
-                1: 'minor_worry_only',
-                2: 'minor_worry_only'
-            }
-        }
-        
-        # 添加症状事实
-        for question, value in responses.items():
-            if question in symptom_mapping and value in symptom_mapping[question]:
-                symptom_name = symptom_mapping[question][value]
-                self.env.assert_string(f'(symptom (name "{symptom_name}") (value 1))')
-        
+        """Evaluate stress using CLIPS expert system (memoized on the frozen responses)"""
+        key = tuple(sorted(responses.items()))
+        with self._lock:
+            result = self._evaluate_cached(key)
+        # 深拷贝，避免调用方改动缓存里的结果
+        return copy.deepcopy(result)
+
+    @functools.lru_cache(maxsize=4096)
+    def _evaluate_cached(self, responses_key: Tuple[Tuple[str, int], ...]) -> Dict[str, object]:
+        """Run the actual CLIPS inference for a canonicalized response tuple"""
+        responses = dict(responses_key)
+
+        # 添加症状事实：十个 0/1 标志按固定位置放进一个列式 symptoms 事实
+        detected = [
+            symptom for symptom in map(FLAT_SYMPTOMS.get, responses.items())
+            if symptom is not None
+        ]
+        present = set(detected)
+        self._symptoms_tmpl.assert_fact(
+            flags=[1 if name in present else 0 for name in _SYMPTOM_ORDER]
+        )
+
         # 添加总分事实
         total_score = sum(responses.values())
         max_score = len(responses) * 5
-        self.env.assert_string(f'(metric (name "total_score") (value {total_score}))')
-        self.env.assert_string(f'(metric (name "max_score") (value {max_score}))')
+        self._metric_tmpl.assert_fact(name="total_score", value=float(total_score))
+        self._metric_tmpl.assert_fact(name="max_score", value=float(max_score))
         
         # 运行推理
         self.env.run()
@@ -419,58 +622,39 @@ class CLIPSExpertSystem:
             "rules_triggered": [],
             "explanations": [],
             "recommendations": [],
-            "symptoms_detected": [],
-            "initial_symptoms": []
+            # 症状列表直接取映射结果：工作内存里只剩指标事实
+            "symptoms_detected": list(detected),
+            "initial_symptoms": list(detected)
         }
         
-        # 获取所有事实
-        for fact in self.env.facts():
-            if fact.template.name == "es_result":
+        # 按模板在引擎内过滤事实，不再把整个事实库搬到 Python 逐个判断
+        max_priority = 0
+        at_terminal_level = False
+        for fact in self.env.eval('(find-all-facts ((?f es_result)) TRUE)'):
+            results["rules_triggered"].append(str(fact["rule"]))
+            results["explanations"].append(str(fact["explanation"]))
+
+            # 确定最终压力等级（取最高等级；very_high 已确定后不再比较）
+            if not at_terminal_level:
                 level = str(fact["level"])
-                rule = str(fact["rule"])
-                explanation = str(fact["explanation"])
-                
-                results["rules_triggered"].append(rule)
-                results["explanations"].append(explanation)
-                
-                # 确定最终压力等级（取最高等级）
-                level_mapping = {
-                    "very_high": 4,
-                    "high": 3,
-                    "moderate": 2,
-                    "low": 1,
-                    "high_risk": 4,
-                    "moderate_risk": 3,
-                    "low_risk": 2
-                }
-                
-                current_level = results["stress_level"]
-                current_priority = level_mapping.get(current_level, 0)
-                new_priority = level_mapping.get(level, 0)
-                
-                if new_priority > current_priority:
-                    results["stress_level"] = level.replace("_risk", "").title()
-            
-            elif fact.template.name == "metric" and str(fact["name"]) == "overall":
-                results["overall_score"] = float(fact["value"])
-            
-            elif fact.template.name == "symptom":
-                symptom_name = str(fact["name"])
-                if "indicator" not in symptom_name:
-                    results["symptoms_detected"].append(symptom_name)
-                    # 也添加到初始症状列表
-                    if symptom_name in ['poor_sleep', 'irritability', 'deadline_pressure', 'persistent_fatigue', 
-                                       'difficulty_concentrating', 'skip_meals', 'racing_thoughts', 
-                                       'procrastination', 'social_withdrawal', 'minor_worry_only']:
-                        results["initial_symptoms"].append(symptom_name)
-        
+                new_priority = _LEVEL_PRIORITY.get(level, 0)
+                # 同级时取后断言的结论（overall 层在 risk 层之后）
+                if new_priority >= max_priority and new_priority > 0:
+                    max_priority = new_priority
+                    results["stress_level"] = _LEVEL_NORMALIZE.get(level, level)
+                    at_terminal_level = level == "very_high"
+
+        # overall 指标用槽位条件直接在引擎内定位
+        overall_facts = self.env.eval('(find-all-facts ((?f metric)) (eq ?f:name "overall"))')
+        if overall_facts:
+            results["overall_score"] = float(overall_facts[0]["value"])
+
         # 获取推荐
         stress_level_lower = results["stress_level"].lower()
-        for fact in self.env.facts():
-            if fact.template.name == "recommendation":
-                rec_level = str(fact["for_level"])
-                if rec_level in stress_level_lower or stress_level_lower in rec_level:
-                    results["recommendations"].append(str(fact["text"]))
+        for fact in self.env.eval('(find-all-facts ((?f recommendation)) TRUE)'):
+            rec_level = str(fact["for_level"])
+            if rec_level in stress_level_lower or stress_level_lower in rec_level:
+                results["recommendations"].append(str(fact["text"]))
         
         # 如果未确定等级，使用后备逻辑
         if results["stress_level"] == "Undetermined":
@@ -483,42 +667,66 @@ class CLIPSExpertSystem:
                 results["stress_level"] = "Moderate"
             else:
                 results["stress_level"] = "Low"
-        
+
+        # 增量清理：只撤销本次请求断言及规则推导出的事实，
+        # 静态推荐事实连同其 Rete 匹配状态跨请求保留
+        for fact in list(self.env.facts()):
+            if fact.template.name not in ('recommendation', 'initial-fact'):
+                fact.retract()
+
         return results
 
-# 创建CLIPS专家系统实例
-clips_expert = CLIPSExpertSystem()
+# 每个 worker 线程一份专家系统实例：环境互不共享，且二进制镜像让懒构建足够快
+_tls = threading.local()
+
+def get_expert():
+    """Return this thread's CLIPSExpertSystem, creating it on first use"""
+    expert = getattr(_tls, 'expert', None)
+    if expert is None:
+        expert = _tls.expert = CLIPSExpertSystem()
+    return expert
+
+
+def evaluate_expert(responses: Dict[str, int]) -> Dict[str, object]:
+    """Evaluate stress: fast Python path by default, CLIPS only when USE_CLIPS is set"""
+    key = tuple(sorted(responses.items()))
+    if not USE_CLIPS:
+        # 默认完全不触碰 CLIPS：既省掉每线程的环境冷启动，
+        # 也不让纯 Python 路径依赖知识库能否构建
+        return copy.deepcopy(_evaluate_fast_cached(key))
+    return get_expert().evaluate_responses(responses)
 
 # ===========================
 # Student Class
 # ===========================
 
+# 问卷字段名，Student 属性按此顺序生成
+_STUDENT_FIELDS = (
+    'anxiety_level', 'self_esteem', 'mental_health_history', 'depression',
+    'headache', 'blood_pressure', 'sleep_quality', 'breathing_problem',
+    'noise_level', 'living_conditions', 'safety', 'basic_needs',
+    'academic_performance', 'study_load', 'teacher_student_relationship',
+    'future_career_concerns', 'social_support', 'peer_pressure',
+    'extracurricular_activities', 'bullying',
+)
+
+
 class Student:
+    # __slots__ 去掉每实例 __dict__：省内存，规则里的属性读取走 C 槽位
+    __slots__ = ('name', 'responses', 'total_score', 'max_score',
+                 'final_stress', 'reasons', 'section_reasons') + _STUDENT_FIELDS
+
     def __init__(self, name, responses):
         self.name = name
         self.responses = responses
-        
+
         # Map fields
-        self.anxiety_level = responses.get('anxiety_level', 1)
-        self.self_esteem = responses.get('self_esteem', 1)
-        self.mental_health_history = responses.get('mental_health_history', 1)
-        self.depression = responses.get('depression', 1)
-        self.headache = responses.get('headache', 1)
-        self.blood_pressure = responses.get('blood_pressure', 1)
-        self.sleep_quality = responses.get('sleep_quality', 1)
-        self.breathing_problem = responses.get('breathing_problem', 1)
-        self.noise_level = responses.get('noise_level', 1)
-        self.living_conditions = responses.get('living_conditions', 1)
-        self.safety = responses.get('safety', 1)
-        self.basic_needs = responses.get('basic_needs', 1)
-        self.academic_performance = responses.get('academic_performance', 1)
-        self.study_load = responses.get('study_load', 1)
-        self.teacher_student_relationship = responses.get('teacher_student_relationship', 1)
-        self.future_career_concerns = responses.get('future_career_concerns', 1)
-        self.social_support = responses.get('social_support', 1)
-        self.peer_pressure = responses.get('peer_pressure', 1)
-        self.extracurricular_activities = responses.get('extracurricular_activities', 1)
-        self.bullying = responses.get('bullying', 1)
+        for field in _STUDENT_FIELDS:
+            setattr(self, field, responses.get(field, 1))
+
+        # 总分/满分只算一次，score_action 和 /assess 共用
+        self.total_score = sum(responses.values())
+        self.max_score = len(responses) * 5
 
         # Final outputs
         self.final_stress = "Low"
@@ -535,24 +743,70 @@ class Student:
 # Rule Engine (保持原有规则引擎用于其他评估)
 # ===========================
 
+# 数值前提编码为 (字段, 运算符, 阈值)，规则条件写成前提的 DNF（OR 的 AND 组）；
+# _compile 把它们直接内联成生成函数里的比较表达式
+_Rule = namedtuple('_Rule', ('condition', 'action', 'priority', 'name', 'group'))
+
+
 class RuleEngine:
     def __init__(self):
         self.rules = []
         self.triggered_rules = []
+        self._fire = None
 
-    def add_rule(self, condition, action, priority, name):
-        self.rules.append((condition, action, priority, name))
+    def add_rule(self, condition, action, priority, name, exclusive_group=None):
+        # 注册时保持按优先级降序，run 时无需再排序；规则变了要重新生成 _fire
+        self.rules.append(_Rule(condition, action, priority, name, exclusive_group))
+        self.rules.sort(key=attrgetter('priority'), reverse=True)
+        self._fire = None
 
     def run(self, student):
-        results = []
-        self.triggered_rules = []
-        for condition, action, priority, name in sorted(self.rules, key=lambda x: x[2], reverse=True):
-            if condition(student):
-                output = action(student)
-                if output:
-                    results.append(output)
-                self.triggered_rules.append(name)
-        return results
+        if self._fire is None:
+            self._fire = self._compile()
+        results, triggered = self._fire(student)
+        # 命中规则随结果一起返回：多线程下各请求拿自己的局部列表，
+        # self.triggered_rules 只作为最近一次运行的快照供 explain() 查看
+        self.triggered_rules = triggered
+        return results, triggered
+
+    def _compile(self):
+        # 把全部规则内联成一个生成函数：DNF 条件展开为属性比较表达式，
+        # 可调用条件保留为调用；去掉逐条规则的 Python 帧开销
+        groups = sorted({rule.group for rule in self.rules if rule.group is not None})
+        lines = ["def _fire(student):", "    results = []", "    triggered = []"]
+        for group in groups:
+            lines.append(f"    fired_{group} = False")
+        for idx, rule in enumerate(self.rules):
+            if callable(rule.condition):
+                expr = f"_conditions[{idx}](student)"
+            else:
+                expr = " or ".join(
+                    "(" + " and ".join(
+                        f"student.{field} {op} {threshold}"
+                        for field, op, threshold in conjunction
+                    ) + ")"
+                    for conjunction in rule.condition
+                )
+            indent = "    "
+            if rule.group is not None:
+                # 同组内高优先级规则已命中时，跳过低优先级规则
+                lines.append(f"    if not fired_{rule.group}:")
+                indent = "        "
+            lines.append(f"{indent}if {expr}:")
+            lines.append(f"{indent}    output = _actions[{idx}](student)")
+            lines.append(f"{indent}    if output:")
+            lines.append(f"{indent}        results.append(output)")
+            lines.append(f"{indent}    triggered.append({rule.name!r})")
+            if rule.group is not None:
+                lines.append(f"{indent}    fired_{rule.group} = True")
+        lines.append("    return results, triggered")
+
+        namespace = {
+            "_actions": [rule.action for rule in self.rules],
+            "_conditions": [rule.condition for rule in self.rules],
+        }
+        exec("\n".join(lines), namespace)
+        return namespace["_fire"]
 
     def explain(self):
         return self.triggered_rules
@@ -592,6 +846,9 @@ ANSWER_SCALE = {
     5: "Always / Very Poor"
 }
 
+# 合法问卷字段白名单：症状映射键 ∪ 问卷键
+_VALID_RESPONSE_KEYS = frozenset(SYMPTOM_MAPPING) | frozenset(QUESTIONS)
+
 # Initialize rule engine
 engine = RuleEngine()
 
@@ -603,7 +860,12 @@ def critical_mental_health_action(s):
     s.section_reasons["Mental State"].append("High anxiety and depression.")
     return f"🔴 Critical Mental Health Risk detected for {s.name}."
 
-engine.add_rule(critical_mental_health_rule, critical_mental_health_action, 100, "Critical Mental State")
+_CRITICAL_MENTAL_DNF = (
+    (('anxiety_level', '>=', 4), ('depression', '>=', 4)),
+    (('mental_health_history', '>=', 4),),
+)
+
+engine.add_rule(_CRITICAL_MENTAL_DNF, critical_mental_health_action, 100, "Critical Mental State")
 
 # ---- Physical Symptoms ----
 def severe_physical_rule(s):
@@ -613,7 +875,11 @@ def severe_physical_action(s):
     s.section_reasons["Physical Symptoms"].append("Severe physical symptoms (headache + sleep + breathing).")
     return f"🔴 Severe physical stress signals detected for {s.name}."
 
-engine.add_rule(severe_physical_rule, severe_physical_action, 90, "Severe Physical Symptoms")
+_SEVERE_PHYSICAL_DNF = (
+    (('headache', '>=', 4), ('sleep_quality', '>=', 4), ('breathing_problem', '>=', 4)),
+)
+
+engine.add_rule(_SEVERE_PHYSICAL_DNF, severe_physical_action, 90, "Severe Physical Symptoms")
 
 # ---- Bullying Crisis ----
 def bullying_rule(s):
@@ -623,7 +889,9 @@ def bullying_action(s):
     s.section_reasons["Social Support"].append("Bullying experience detected.")
     return f"🔴 Bullying concern identified for {s.name}."
 
-engine.add_rule(bullying_rule, bullying_action, 85, "Bullying Crisis")
+_BULLYING_DNF = ((('bullying', '>=', 4),),)
+
+engine.add_rule(_BULLYING_DNF, bullying_action, 85, "Bullying Crisis", exclusive_group="social")
 
 # ---- Academic Pressure ----
 def academic_pressure_rule(s):
@@ -633,7 +901,11 @@ def academic_pressure_action(s):
     s.section_reasons["Academic Pressure"].append("Heavy study load and career concerns.")
     return f"🟡 Academic stress detected for {s.name}."
 
-engine.add_rule(academic_pressure_rule, academic_pressure_action, 70, "Academic Pressure")
+_ACADEMIC_PRESSURE_DNF = (
+    (('study_load', '>=', 4), ('future_career_concerns', '>=', 4)),
+)
+
+engine.add_rule(_ACADEMIC_PRESSURE_DNF, academic_pressure_action, 70, "Academic Pressure")
 
 # ---- Environmental Stress ----
 def environment_rule(s):
@@ -643,7 +915,13 @@ def environment_action(s):
     s.section_reasons["Environmental Factors"].append("Poor environment or unmet basic needs.")
     return f"🟡 Environmental stress detected for {s.name}."
 
-engine.add_rule(environment_rule, environment_action, 60, "Environmental Stress")
+_ENVIRONMENT_DNF = (
+    (('noise_level', '>=', 4),),
+    (('basic_needs', '>=', 4),),
+    (('living_conditions', '>=', 4),),
+)
+
+engine.add_rule(_ENVIRONMENT_DNF, environment_action, 60, "Environmental Stress")
 
 # ---- Social Isolation ----
 def social_rule(s):
@@ -653,94 +931,227 @@ def social_action(s):
     s.section_reasons["Social Support"].append("Low support + high peer pressure.")
     return f"🟡 Social support issues detected for {s.name}."
 
-engine.add_rule(social_rule, social_action, 55, "Social Support Issue")
+_SOCIAL_DNF = (
+    (('social_support', '<=', 2), ('peer_pressure', '>=', 4)),
+)
+
+engine.add_rule(_SOCIAL_DNF, social_action, 55, "Social Support Issue", exclusive_group="social")
 
 # ---- Overall Score ----
+def _stress_from_total(total):
+    if total > 80:
+        return "Very High"
+    if total > 60:
+        return "High"
+    if total > 40:
+        return "Moderate"
+    return "Low"
+
 def score_rule(s):
     return True
 
 def score_action(s):
-    total = sum(s.responses.values())
-    max_score = len(s.responses) * 5
-    stress = "Low"
-    if total > 80: 
-        stress = "Very High"
-    elif total > 60: 
-        stress = "High"
-    elif total > 40: 
-        stress = "Moderate"
-
+    stress = _stress_from_total(s.total_score)
     s.final_stress = stress
     return f"📊 Overall Stress Level for {s.name}: {stress}"
 
 engine.add_rule(score_rule, score_action, 10, "Overall Score")
 
+# ===========================
+# Batch Scoring Kernel
+# ===========================
+
+# 批量评估时各规则对应的名称，列序与 _evaluate_batch_kernel 输出一致
+_BATCH_RULE_NAMES = (
+    "Critical Mental State", "Severe Physical Symptoms", "Bullying Crisis",
+    "Academic Pressure", "Environmental Stress", "Social Support Issue",
+)
+
+_BATCH_PREDICATES = (
+    critical_mental_health_rule, severe_physical_rule, bullying_rule,
+    academic_pressure_rule, environment_rule, social_rule,
+)
+
+# 互斥组（与引擎注册一致）：(高优先级列, 被压制列)，
+# Bullying Crisis 命中时压制同组的 Social Support Issue
+_BATCH_EXCLUSIVE = ((2, 5),)
+
+# NumPy 与 Numba 各自独立可选：缺 numba 只关掉 JIT 内核，
+# 不影响 /assess 的 NumPy 批量转换；缺 numpy 两者都退回解释执行
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+_evaluate_batch_kernel = None
+
+if np is not None and njit is not None:
+    @njit(parallel=True, cache=True)
+    def _evaluate_batch_kernel(arr):
+        """(N, 20) int8 矩阵 -> (N, 6) bool 规则命中矩阵，列序同 _STUDENT_FIELDS"""
+        n = arr.shape[0]
+        out = np.zeros((n, 6), dtype=np.bool_)
+        for i in prange(n):
+            out[i, 0] = (arr[i, 0] >= 4 and arr[i, 3] >= 4) or arr[i, 2] >= 4
+            out[i, 1] = arr[i, 4] >= 4 and arr[i, 6] >= 4 and arr[i, 7] >= 4
+            out[i, 2] = arr[i, 19] >= 4
+            out[i, 3] = arr[i, 13] >= 4 and arr[i, 15] >= 4
+            out[i, 4] = arr[i, 8] >= 4 or arr[i, 11] >= 4 or arr[i, 9] >= 4
+            out[i, 5] = arr[i, 16] <= 2 and arr[i, 17] >= 4
+        return out
+
 # ===========================
 # Flask Routes
 # ===========================
 
+def build_static():
+    """Render the questionnaire form once and dump it under static/"""
+    os.makedirs(app.static_folder, exist_ok=True)
+    with app.test_request_context():
+        html = render_template('indexyu.html', questions=QUESTIONS, answer_scale=ANSWER_SCALE)
+    with open(os.path.join(app.static_folder, 'index.html'), 'w', encoding='utf-8') as fh:
+        fh.write(html)
+
+# 启动时生成静态首页，GET / 直接走文件（上游 nginx 也可以 try_files 接管）
+build_static()
+
 @app.route('/')
 def index():
-    return render_template('indexyu.html', questions=QUESTIONS, answer_scale=ANSWER_SCALE)
+    return send_from_directory(app.static_folder, 'index.html', max_age=3600)
 
 @app.route('/assess', methods=['POST'])
 def assess():
     try:
-        data = request.json
-        name = data.get('name', '')
-        responses = data.get('responses', {})
-        
-        # Convert string values to integers
-        for key in responses:
-            responses[key] = int(responses[key])
-        
-        # Create student and run rule-based assessment
-        student = Student(name, responses)
-        results = engine.run(student)
-        
-        # Run CLIPS expert system evaluation
-        expert_results = clips_expert.evaluate_responses(responses)
-        
-        # Determine final stress level (优先使用CLIPS结果)
-        clips_level = expert_results["stress_level"]
-        if clips_level != "Undetermined":
-            final_stress = clips_level
+        if msgspec is not None:
+            # 解析 + int 强制转换在 msgspec 的单次 C 扫描内完成
+            try:
+                req = _ASSESS_DECODER.decode(request.get_data())
+            except msgspec.DecodeError:
+                return jsonify({'error': 'responses must be integer values'}), 400
+            name = req.name
+            responses = {
+                key: value for key, value in req.responses.items()
+                if key in _VALID_RESPONSE_KEYS
+            }
         else:
-            final_stress = student.final_stress
-        
-        # 将CLIPS结果转换为用户友好的格式
-        level_display = {
-            "Very_High": "Very High",
-            "High": "High",
-            "Moderate": "Moderate",
-            "Low": "Low",
-            "Very High": "Very High",
-            "High": "High",
-            "Moderate": "Moderate",
-            "Low": "Low"
-        }
-        final_stress_display = level_display.get(final_stress.replace(" ", "_"), final_stress)
-        
-        # Prepare response
-        response_data = {
-            'name': student.name,
-            'final_stress': final_stress_display,
-            'clips_stress_level': expert_results["stress_level"],
-            'clips_overall_score': expert_results["overall_score"],
-            'results': results,
-            'section_reasons': student.section_reasons,
-            'triggered_rules': engine.explain(),
-            'total_score': sum(student.responses.values()),
-            'max_score': len(student.responses) * 5,
-            'expert_system': expert_results
-        }
-        
+            data = request.json
+            name = data.get('name', '')
+
+            # 白名单过滤 + 一次性转换，不再原地改写请求 JSON；
+            # NumPy 可用时整批走一次 C 级 int8 转换
+            raw = data.get('responses', {})
+            try:
+                keys = [key for key in raw if key in _VALID_RESPONSE_KEYS]
+                if np is not None:
+                    values = np.asarray([raw[key] for key in keys]).astype(np.int8)
+                    responses = dict(zip(keys, values.tolist()))
+                else:
+                    responses = {key: int(raw[key]) for key in keys}
+            except (TypeError, ValueError):
+                return jsonify({'error': 'responses must be integer values'}), 400
+
+        # 评估是 (name, responses) 的纯函数，整体按规范化元组缓存；
+        # 浅拷贝一层，防止调用方改动缓存对象
+        response_data = dict(_assess_cached(name, tuple(sorted(responses.items()))))
         return jsonify(response_data)
-        
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@functools.lru_cache(maxsize=4096)
+def _assess_cached(name, responses_key):
+    """Run the full assessment for a canonicalized response tuple"""
+    responses = dict(responses_key)
+
+    # Create student and run rule-based assessment
+    student = Student(name, responses)
+    results, triggered_rules = engine.run(student)
+
+    # Run CLIPS expert system evaluation
+    expert_results = evaluate_expert(responses)
+
+    # Determine final stress level (优先使用CLIPS结果)
+    clips_level = expert_results["stress_level"]
+    if clips_level != "Undetermined":
+        final_stress = clips_level
+    else:
+        final_stress = student.final_stress
+
+    # 将CLIPS结果转换为用户友好的格式
+    final_stress_display = _LEVEL_DISPLAY.get(final_stress.replace(" ", "_"), final_stress)
+
+    # Prepare response
+    return {
+        'name': student.name,
+        'final_stress': final_stress_display,
+        'clips_stress_level': expert_results["stress_level"],
+        'clips_overall_score': expert_results["overall_score"],
+        'results': results,
+        'section_reasons': student.section_reasons,
+        'triggered_rules': triggered_rules,
+        'total_score': student.total_score,
+        'max_score': student.max_score,
+        'expert_system': expert_results
+    }
+
+@app.route('/assess_batch', methods=['POST'])
+def assess_batch():
+    """Score a list of students in one call via the vectorized kernel"""
+    try:
+        data = request.json
+        students = data.get('students', [])
+
+        names = []
+        rows = []
+        for entry in students:
+            responses = {key: int(value) for key, value in entry.get('responses', {}).items()}
+            names.append(entry.get('name', ''))
+            rows.append([responses.get(field, 1) for field in _STUDENT_FIELDS])
+
+        if _evaluate_batch_kernel is not None and rows:
+            arr = np.asarray(rows, dtype=np.int8)
+            hit_matrix = _evaluate_batch_kernel(arr)
+        else:
+            # 解释器后备路径：逐行跑同一组谓词
+            hit_matrix = []
+            for name, row in zip(names, rows):
+                student = Student(name, dict(zip(_STUDENT_FIELDS, row)))
+                hit_matrix.append([predicate(student) for predicate in _BATCH_PREDICATES])
+
+        results = []
+        for name, row, hits in zip(names, rows, hit_matrix):
+            # 同组内高优先级规则命中时压制低优先级规则，与 /assess 的互斥组一致
+            hits = list(hits)
+            for winner, loser in _BATCH_EXCLUSIVE:
+                if hits[winner]:
+                    hits[loser] = False
+            total = int(sum(row))
+            results.append({
+                'name': name,
+                'final_stress': _stress_from_total(total),
+                'triggered_rules': [rule_name for rule_name, hit in zip(_BATCH_RULE_NAMES, hits) if hit],
+                'total_score': total,
+                'max_score': len(row) * 5,
+            })
+
+        return jsonify({'results': results})
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
     print("Starting Student Stress Detection System with CLIPS Expert System...")
     print("Access the application at: http://127.0.0.1:5000")
-    app.run(debug=True, host='127.0.0.1', port=5000)
\ No newline at end of file
+    if os.environ.get('FLASK_DEV'):
+        # 开发模式才启用调试器；重载器会把模块 import 两遍（知识库重建两次），
+        # 需要时再显式打开
+        app.run(debug=True, host='127.0.0.1', port=5000,
+                use_reloader=os.environ.get('FLASK_USE_RELOADER') == '1')
+    else:
+        from waitress import serve
+        serve(app, host='127.0.0.1', port=5000, threads=8)
\ No newline at end of file
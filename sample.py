@@ -1,31 +1,35 @@
+import functools
+import graphlib
 import tkinter as tk
+import types
 from tkinter import ttk
-from typing import Dict, List, Set, Tuple
-
-# 规则类型：条件列表 -> 结论
-Rule = Tuple[List[str], str]
-
-# 规则库：显式 IF-THEN 规则，用于前向链推理
-RULES: List[Rule] = [
-    (["poor_sleep", "irritability", "deadline_pressure"], "stress_high"),
-    (["persistent_fatigue", "difficulty_concentrating"], "stress_high"),
-    (["skip_meals", "racing_thoughts"], "stress_high"),
-    (["procrastination", "deadline_pressure"], "stress_moderate"),
-    (["social_withdrawal", "irritability"], "stress_moderate"),
-    (["minor_worry_only"], "stress_low"),
+from typing import Dict, List, Mapping, NamedTuple, Set, Tuple
+
+# 规则类型：条件元组 -> 结论
+Rule = Tuple[Tuple[str, ...], str]
+
+# 规则库：显式 IF-THEN 规则，用于前向链推理。
+# 常量表全部冻结（元组/只读映射），解释器可走不可变对象的快速路径
+RULES: Tuple[Rule, ...] = (
+    (("poor_sleep", "irritability", "deadline_pressure"), "stress_high"),
+    (("persistent_fatigue", "difficulty_concentrating"), "stress_high"),
+    (("skip_meals", "racing_thoughts"), "stress_high"),
+    (("procrastination", "deadline_pressure"), "stress_moderate"),
+    (("social_withdrawal", "irritability"), "stress_moderate"),
+    (("minor_worry_only",), "stress_low"),
     # 从压力等级继续推导管理建议
-    (["stress_high"], "rec_breaks"),
-    (["stress_high"], "rec_counselor"),
-    (["stress_high"], "rec_sleep"),
-    (["stress_high"], "rec_time_block"),
-    (["stress_moderate"], "rec_plan"),
-    (["stress_moderate"], "rec_exercise"),
-    (["stress_moderate"], "rec_peer"),
-    (["stress_low"], "rec_monitor"),
-]
+    (("stress_high",), "rec_breaks"),
+    (("stress_high",), "rec_counselor"),
+    (("stress_high",), "rec_sleep"),
+    (("stress_high",), "rec_time_block"),
+    (("stress_moderate",), "rec_plan"),
+    (("stress_moderate",), "rec_exercise"),
+    (("stress_moderate",), "rec_peer"),
+    (("stress_low",), "rec_monitor"),
+)
 
 # 解释/建议文本
-EXPLANATIONS: Dict[str, str] = {
+EXPLANATIONS: Mapping[str, str] = types.MappingProxyType({
     "stress_high": "多项强烈压力指标，存在倦怠风险。",
     "stress_moderate": "有明显压力信号，可通过结构化管理缓解。",
     "stress_low": "轻度压力，保持观察。",
@@ -37,10 +41,10 @@ EXPLANATIONS: Dict[str, str] = {
     "rec_exercise": "每周 3–4 次、每次 20–30 分钟轻运动。",
     "rec_peer": "与同伴结伴学习或定期交流，减少孤立感。",
     "rec_monitor": "保持日常作息，记录情绪与睡眠，按周复盘。",
-}
+})
 
 # 症状选项及展示名称
-SYMPTOMS: Dict[str, str] = {
+SYMPTOMS: Mapping[str, str] = types.MappingProxyType({
     "poor_sleep": "Poor sleep (≥3 nights/week)",
     "irritability": "Irritability",
     "deadline_pressure": "Deadlines within 7 days",
@@ -51,45 +55,164 @@ SYMPTOMS: Dict[str, str] = {
     "procrastination": "Frequent procrastination",
     "social_withdrawal": "Social withdrawal",
     "minor_worry_only": "Minor worry only",
+})
+
+
+# 位编码事实空间：每个符号占一个比特，事实集合就是一个整数
+FACT_BITS: Dict[str, int] = {}
+for _name in SYMPTOMS:
+    FACT_BITS[_name] = 1 << len(FACT_BITS)
+for _conditions, _conclusion in RULES:
+    for _name in (*_conditions, _conclusion):
+        if _name not in FACT_BITS:
+            FACT_BITS[_name] = 1 << len(FACT_BITS)
+
+_FACT_NAMES: List[str] = list(FACT_BITS)
+
+_STRESS_LEVEL_FACTS = ("stress_high", "stress_moderate", "stress_low")
+
+# 规则按结论分层：等级推导走前向链，推荐层退化为等级 -> 推荐掩码的查表
+_LEVEL_RULES: Tuple[Rule, ...] = tuple(
+    (conditions, conclusion) for conditions, conclusion in RULES
+    if conclusion in _STRESS_LEVEL_FACTS
+)
+
+_LEVEL_REC_MASKS: Dict[str, int] = {"high": 0, "moderate": 0, "low": 0}
+for _conditions, _conclusion in RULES:
+    if _conclusion.startswith("rec_"):
+        _level = _conditions[0][len("stress_"):]
+        _LEVEL_REC_MASKS[_level] |= FACT_BITS[_conclusion]
+
+# 规则按结论依赖拓扑排序：规则图是 症状 -> 等级 -> 推荐 的两层 DAG
+# （推荐层已退化为查表），排序后单次线性扫描即达不动点，
+# 无需 while-changed 外层循环或工作表
+_sorter: "graphlib.TopologicalSorter[int]" = graphlib.TopologicalSorter()
+for _idx, (_conditions, _) in enumerate(_LEVEL_RULES):
+    _sorter.add(_idx)
+    for _jdx, (_, _other_conclusion) in enumerate(_LEVEL_RULES):
+        if _other_conclusion in _conditions:
+            _sorter.add(_idx, _jdx)
+
+# 等级规则按拓扑序编码为 (前提掩码, 结论位)，命中判定为一次 AND + 比较。
+# 规则量级在几十条以内时位掩码 + 单遍扫描即可；若规则库继续增长，
+# 应换成对前提集合建 trie/Aho-Corasick，使匹配摊还到 O(新事实数)。
+COMPILED_RULES: Tuple[Tuple[int, int], ...] = tuple(
+    (
+        sum(FACT_BITS[cond] for cond in _LEVEL_RULES[idx][0]),
+        FACT_BITS[_LEVEL_RULES[idx][1]],
+    )
+    for idx in _sorter.static_order()
+)
+
+_STRESS_HIGH_BIT = FACT_BITS["stress_high"]
+_STRESS_MODERATE_BIT = FACT_BITS["stress_moderate"]
+_STRESS_LOW_BIT = FACT_BITS["stress_low"]
+
+# rec_* 结论及其比特，推荐列表按位序直接给出，无需排序或前缀判断
+_REC_BITS: Tuple[Tuple[str, int], ...] = tuple(
+    (name, FACT_BITS[name]) for name in _FACT_NAMES if name.startswith("rec_")
+)
+
+# 事实 -> 展示文本的合并表：症状用选项名，结论用解释文本（SYMPTOMS 优先），
+# 渲染时每个事实只查一次字典
+LABEL_FOR_FACT: Dict[str, str] = {**EXPLANATIONS, **SYMPTOMS}
+
+# 等级 -> 解释文本：渲染时一次查表，省掉每次点击的 "stress_" + level 拼接
+_LEVEL_EXPLANATIONS: Dict[str, str] = {
+    "high": EXPLANATIONS["stress_high"],
+    "moderate": EXPLANATIONS["stress_moderate"],
+    "low": EXPLANATIONS["stress_low"],
+    "undetermined": "未确定",
 }
 
 
+# Numba/NumPy 可选：装了就把掩码扫描 JIT 成整数 AND/OR 紧循环，没装走纯 Python
+try:
+    import numba as nb
+    import numpy as np
+except ImportError:
+    nb = None
+
+if nb is not None:
+    _PREMISE_MASKS = np.array([mask for mask, _ in COMPILED_RULES], dtype=np.int64)
+    _CONCLUSION_BITS = np.array([bit for _, bit in COMPILED_RULES], dtype=np.int64)
+
+    # 显式签名避免惰性分派；cache=True 跨进程复用编译产物
+    @nb.njit(nb.int64(nb.int64, nb.int64[:], nb.int64[:]), cache=True)
+    def _forward_chain_kernel(facts, premise_masks, conclusion_bits):
+        for idx in range(premise_masks.shape[0]):
+            premise_mask = premise_masks[idx]
+            if (facts & premise_mask) == premise_mask:
+                facts |= conclusion_bits[idx]
+        return facts
+
+    # 导入时预热一次，把编译开销挪出首次评估
+    _forward_chain_kernel(0, _PREMISE_MASKS, _CONCLUSION_BITS)
+
+    def _forward_chain_mask(facts: int) -> int:
+        """拓扑序单遍前向链（JIT 内核）：规则按依赖排好序，线性扫一遍即不动点"""
+        return int(_forward_chain_kernel(facts, _PREMISE_MASKS, _CONCLUSION_BITS))
+else:
+    def _forward_chain_mask(facts: int) -> int:
+        """拓扑序单遍前向链：规则按依赖排好序，线性扫一遍即不动点"""
+        for premise_mask, conclusion_bit in COMPILED_RULES:
+            if (facts & premise_mask) == premise_mask:
+                facts |= conclusion_bit
+        return facts
+
+
 def forward_chain(initial_facts: List[str]) -> Set[str]:
-    """前向链推理：满足规则条件则添加结论，直到无新事实"""
-    facts: Set[str] = set(initial_facts)
-    changed = True
-    while changed:
-        changed = False
-        for conditions, conclusion in RULES:
-            if conclusion in facts:
-                continue
-            if all(cond in facts for cond in conditions):
-                facts.add(conclusion)
-                changed = True
-    return facts
-
-
-def classify_stress(facts: Set[str]) -> str:
-    """按优先级选定压力等级"""
-    if "stress_high" in facts:
-        return "high"
-    if "stress_moderate" in facts:
-        return "moderate"
-    if "stress_low" in facts:
-        return "low"
-    return "undetermined"
-
-
-def evaluate(symptoms: List[str]) -> Dict[str, object]:
-    """外部调用接口：输入症状列表，返回推理结果"""
-    inferred = forward_chain(symptoms)
-    level = classify_stress(inferred)
-    recs = [fact for fact in inferred if fact.startswith("rec_")]
-    return {
-        "stress_level": level,
-        "inferred_facts": sorted(inferred),
-        "recommendations": [EXPLANATIONS.get(rec, rec) for rec in recs],
-    }
+    """前向链推理：边界处编解码字符串事实，内部全部走位运算"""
+    mask = 0
+    for name in initial_facts:
+        mask |= FACT_BITS.get(name, 0)
+    inferred = _forward_chain_mask(mask)
+    level = _LEVEL_TABLE[(inferred >> _LEVEL_SHIFT) & 0x7]
+    inferred |= _LEVEL_REC_MASKS.get(level, 0)
+    return {name for name in _FACT_NAMES if inferred & FACT_BITS[name]}
+
+
+# 等级三比特按规则结论顺序连续分配，右移后 0..7 查表，优先级烘焙进表里
+_LEVEL_SHIFT = _STRESS_HIGH_BIT.bit_length() - 1
+_LEVEL_TABLE: Tuple[str, ...] = tuple(
+    "high" if (idx << _LEVEL_SHIFT) & _STRESS_HIGH_BIT
+    else "moderate" if (idx << _LEVEL_SHIFT) & _STRESS_MODERATE_BIT
+    else "low" if (idx << _LEVEL_SHIFT) & _STRESS_LOW_BIT
+    else "undetermined"
+    for idx in range(8)
+)
+
+
+class EvalResult(NamedTuple):
+    """一次评估的不可变结果，字段全为元组，可在缓存中安全共享"""
+
+    stress_level: str
+    inferred_facts: Tuple[str, ...]
+    recommendations: Tuple[str, ...]
+
+
+@functools.lru_cache(maxsize=1024)
+def _evaluate_mask(mask: int) -> EvalResult:
+    """按症状掩码缓存推理结果：输入空间只有 2^10 种组合，重复评估命中查表"""
+    inferred = _forward_chain_mask(mask)
+    # 定级就是一次移位 + 查表（优先级已烘焙进 _LEVEL_TABLE）
+    level = _LEVEL_TABLE[(inferred >> _LEVEL_SHIFT) & 0x7]
+    inferred |= _LEVEL_REC_MASKS.get(level, 0)
+    return EvalResult(
+        stress_level=level,
+        # 位序即规范序：按 _FACT_NAMES 一次遍历输出置位的名字
+        inferred_facts=tuple(name for name in _FACT_NAMES if inferred & FACT_BITS[name]),
+        recommendations=tuple(EXPLANATIONS[name] for name, bit in _REC_BITS if inferred & bit),
+    )
+
+
+def evaluate(symptoms: List[str]) -> EvalResult:
+    """外部调用接口：输入症状列表，返回不可变的推理结果"""
+    mask = 0
+    for name in symptoms:
+        mask |= FACT_BITS.get(name, 0)
+    # 结果不可变，直接返回缓存里的同一实例，重复评估零分配
+    return _evaluate_mask(mask)
 
 
 class StressApp(tk.Tk):
@@ -99,7 +222,13 @@ class StressApp(tk.Tk):
         super().__init__()
         self.title("Academic Stress Expert System")
         self.resizable(False, False)
-        self.vars: Dict[str, tk.BooleanVar] = {}
+        # 勾选状态放 Python 侧 bytearray，checkbutton 回调翻转对应字节；
+        # Evaluate 时读本地内存即可，不再对每个 BooleanVar 做 Tcl 往返
+        self._key_index: Tuple[str, ...] = tuple(SYMPTOMS)
+        self._state = bytearray(len(self._key_index))
+        self._checks: List[tk.Checkbutton] = []
+        # 整段渲染文本按勾选集合缓存：键空间最多 2^10，重复点 Evaluate 零成本
+        self._render_cache: Dict[frozenset, str] = {}
         self._build_ui()
 
     def _build_ui(self) -> None:
@@ -110,65 +239,73 @@ class StressApp(tk.Tk):
         frame = tk.Frame(self)
         frame.grid(row=1, column=0, sticky="w", padx=12)
 
-        for idx, (key, label) in enumerate(SYMPTOMS.items()):
-            var = tk.BooleanVar()
-            chk = tk.Checkbutton(frame, text=label, variable=var, anchor="w", justify="left")
+        for idx, label in enumerate(SYMPTOMS.values()):
+            chk = tk.Checkbutton(
+                frame, text=label, anchor="w", justify="left",
+                command=lambda i=idx: self._toggle(i),
+            )
             chk.grid(row=idx, column=0, sticky="w")
-            self.vars[key] = var
+            self._checks.append(chk)
 
         buttons = tk.Frame(self)
         buttons.grid(row=2, column=0, sticky="w", padx=12, pady=(8, 4))
         ttk.Button(buttons, text="Evaluate", command=self.on_evaluate).grid(row=0, column=0, padx=(0, 8))
         ttk.Button(buttons, text="Reset", command=self.on_reset).grid(row=0, column=1)
 
-        self.result_txt = tk.Text(self, width=60, height=16, state="disabled")
-        self.result_txt.grid(row=3, column=0, padx=12, pady=(4, 12))
+        # 只读结果区用 StringVar + Label：更新是一次 Tcl 字符串赋值，
+        # 不再有 Text 控件整块 delete/insert 的行索引重建
+        self.result_var = tk.StringVar()
+        result_lbl = ttk.Label(
+            self, textvariable=self.result_var, justify="left", anchor="nw", width=60
+        )
+        result_lbl.grid(row=3, column=0, sticky="w", padx=12, pady=(4, 12))
+
+    def _toggle(self, idx: int) -> None:
+        """checkbutton 回调：翻转对应症状的勾选字节"""
+        self._state[idx] ^= 1
 
     def on_evaluate(self) -> None:
-        """收集症状，调用推理引擎，并渲染结果"""
-        selected_keys = [key for key, var in self.vars.items() if var.get()]
+        """收集症状，查渲染缓存，未命中才走推理 + 渲染"""
+        selected_keys = [
+            self._key_index[idx] for idx, flag in enumerate(self._state) if flag
+        ]
+        cache_key = frozenset(selected_keys)
+        text = self._render_cache.get(cache_key)
+        if text is None:
+            text = self._render_cache[cache_key] = self._render(selected_keys)
+        self.result_var.set(text)
+
+    def _render(self, selected_keys: List[str]) -> str:
+        """调用推理引擎并把结果排版成展示文本"""
         result = evaluate(selected_keys)
 
-        selected_labels = [SYMPTOMS.get(key, key) for key in selected_keys]
-        inferred_labels = [SYMPTOMS.get(fact, EXPLANATIONS.get(fact, fact)) for fact in result["inferred_facts"]]
-        recs = result["recommendations"]
-        stress = result["stress_level"]
-        explanation = EXPLANATIONS.get("stress_" + stress, "") if stress != "undetermined" else "未确定"
-
-        lines: List[str] = []
-        lines.append("已选择症状:")
-        if selected_labels:
-            lines.extend([f"  - {item}" for item in selected_labels])
-        else:
-            lines.append("  - 无")
-
-        lines.append(f"\n压力等级: {stress}")
-        lines.append(f"解释: {explanation}")
-
-        lines.append("\n推理得到事实:")
-        if inferred_labels:
-            lines.extend([f"  - {item}" for item in inferred_labels])
-        else:
-            lines.append("  - 无")
-
-        lines.append("\n建议:")
-        if recs:
-            lines.extend([f"  - {rec}" for rec in recs])
-        else:
-            lines.append("  - 暂无（证据不足）")
-
-        self.result_txt.configure(state="normal")
-        self.result_txt.delete("1.0", tk.END)
-        self.result_txt.insert(tk.END, "\n".join(lines))
-        self.result_txt.configure(state="disabled")
+        stress = result.stress_level
+        explanation = _LEVEL_EXPLANATIONS.get(stress, "")
+
+        selected = "\n".join(
+            f"  - {LABEL_FOR_FACT.get(key, key)}" for key in selected_keys
+        ) or "  - 无"
+        inferred = "\n".join(
+            f"  - {LABEL_FOR_FACT.get(fact, fact)}" for fact in result.inferred_facts
+        ) or "  - 无"
+        advice = "\n".join(
+            f"  - {rec}" for rec in result.recommendations
+        ) or "  - 暂无（证据不足）"
+
+        return (
+            f"已选择症状:\n{selected}\n"
+            f"\n压力等级: {stress}\n"
+            f"解释: {explanation}\n"
+            f"\n推理得到事实:\n{inferred}\n"
+            f"\n建议:\n{advice}"
+        )
 
     def on_reset(self) -> None:
         """清空勾选与结果，便于重复评估"""
-        for var in self.vars.values():
-            var.set(False)
-        self.result_txt.configure(state="normal")
-        self.result_txt.delete("1.0", tk.END)
-        self.result_txt.configure(state="disabled")
+        for chk in self._checks:
+            chk.deselect()
+        self._state[:] = bytes(len(self._state))
+        self.result_var.set("")
 
 
 def main() -> None:
@@ -1,84 +1,43 @@
 from flask import Flask, render_template, request
-from clips import Environment
 
 app = Flask(__name__)
 
 # ------------------------------
-# 1. 创建 CLIPS 环境 + 模板 + 规则
+# 1. 等级规则：overall 压力分数 -> 等级
 # ------------------------------
 
-env = Environment()
-
-# 用一个 metric 模板来保存整体压力评分
-env.build(r"""
-(deftemplate metric
-    (slot name)
-    (slot value (type FLOAT)))
-""")
-
-# 用 es_result 保存推理结果（等级 + 使用的规则）
-env.build(r"""
-(deftemplate es_result
-    (slot level)
-    (slot rule))
-""")
-
-# 规则：根据 overall 压力分数决定等级
-# >=4.0 : very_high
-env.build(r"""
-(defrule very-high-stress
-    (metric (name overall) (value ?v))
-    (test (>= ?v 4.0))
- =>
-    (assert (es_result
-        (level very_high)
-        (rule "rule-very-high-overall")))
+# 原来的四条 CLIPS 规则只是对单个 overall 浮点数做互斥区间判断，
+# 直接用阈值表替代整个 CLIPS 环境：省掉 reset/assert/run 往返，
+# 也消除了多线程下共享 env 的竞态
+# >=4.0 : very_high；3.0–3.99 : high；2.0–2.99 : moderate；<2.0 : low
+_THRESHOLDS = (
+    (4.0, "very_high", "rule-very-high-overall"),
+    (3.0, "high", "rule-high-overall"),
+    (2.0, "moderate", "rule-moderate-overall"),
+    (float("-inf"), "low", "rule-low-overall"),
 )
-""")
-
-# 3.0–3.99 : high
-env.build(r"""
-(defrule high-stress
-    (metric (name overall) (value ?v))
-    (test (and (>= ?v 3.0) (< ?v 4.0)))
- =>
-    (assert (es_result
-        (level high)
-        (rule "rule-high-overall")))
-)
-""")
-
-# 2.0–2.99 : moderate
-env.build(r"""
-(defrule moderate-stress
-    (metric (name overall) (value ?v))
-    (test (and (>= ?v 2.0) (< ?v 3.0)))
- =>
-    (assert (es_result
-        (level moderate)
-        (rule "rule-moderate-overall")))
-)
-""")
-
-# <2.0 : low
-env.build(r"""
-(defrule low-stress
-    (metric (name overall) (value ?v))
-    (test (< ?v 2.0))
- =>
-    (assert (es_result
-        (level low)
-        (rule "rule-low-overall")))
-)
-""")
 
 
 # ------------------------------
 # 2. Python 这边负责把 1–5 题目变成 overall_score
 # ------------------------------
 
-NEGATIVE_KEYS = ["anxiety_level", "depression", "study_load"]   # 分数越高 = 压力越大
-POSITIVE_KEYS = ["self_esteem", "sleep_quality"]                # 分数越高 = 状态越好 → 压力越小
+# NumPy 可选：装了就整批算压力分数，没装走标量路径
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+NEGATIVE_KEYS = frozenset(["anxiety_level", "depression", "study_load"])   # 分数越高 = 压力越大
+POSITIVE_KEYS = frozenset(["self_esteem", "sleep_quality"])                # 分数越高 = 状态越好 → 压力越小
+
+# 固定题目顺序，把“正向题 6-value 反转”预编码成方向/偏移向量：score = sign*value + offset
+KEY_ORDER = ("anxiety_level", "self_esteem", "depression", "sleep_quality", "study_load")
+_SIGNS = tuple(-1 if key in POSITIVE_KEYS else 1 for key in KEY_ORDER)
+_OFFSETS = tuple(6 if key in POSITIVE_KEYS else 0 for key in KEY_ORDER)
+if np is not None:
+    _SIGN_VEC = np.array(_SIGNS, dtype=np.int8)
+    _OFFSET_VEC = np.array(_OFFSETS, dtype=np.int8)
 
 
 def to_stress_score(key: str, value: int) -> int:
@@ -88,6 +47,14 @@ def to_stress_score(key: str, value: int) -> int:
     return value
 
 
+def _classify(overall: float):
+    """阈值表分级：几次浮点比较，比缓存查找还便宜，无需再记忆化。"""
+    for threshold, level_symbol, triggered_rule in _THRESHOLDS:
+        if overall >= threshold:
+            return level_symbol, triggered_rule
+    return "unknown", "none"
+
+
 def run_inference_with_clips(responses: dict):
     """
     responses 例子：
@@ -100,31 +67,24 @@ def run_inference_with_clips(responses: dict):
     }
     这里：
     1) Python 算压力分数 + overall 平均
-    2) 把 overall 丢给 CLIPSpy，让 CLIPS 规则分类
+    2) 按阈值表对 overall 分级
     """
 
-    # 1. 各题压力分数
-    stress_scores = {}
-    for k, v in responses.items():
-        stress_scores[k] = to_stress_score(k, v)
-
-    all_scores = list(stress_scores.values())
-    overall = sum(all_scores) / len(all_scores) if all_scores else 0.0
-
-    # 2. 把 overall 丢给 CLIPS 环境
-    env.reset()
-    env.assert_string(f"(metric (name overall) (value {overall}))")
-    env.run()
-
-    # 3. 从 es_result 里面取出 level & rule
-    level_symbol = "unknown"
-    triggered_rule = "none"
+    # 1. 各题压力分数：方向向量一次算完，逐键的反转判断只留给标量后备路径
+    if np is not None and responses.keys() == frozenset(KEY_ORDER):
+        values = np.fromiter(
+            (responses[key] for key in KEY_ORDER), dtype=np.int8, count=len(KEY_ORDER)
+        )
+        scores = _SIGN_VEC * values + _OFFSET_VEC
+        stress_scores = dict(zip(KEY_ORDER, scores.tolist()))
+        overall = float(scores.mean())
+    else:
+        stress_scores = {k: to_stress_score(k, v) for k, v in responses.items()}
+        all_scores = list(stress_scores.values())
+        overall = sum(all_scores) / len(all_scores) if all_scores else 0.0
 
-    for fact in env.facts():
-        if fact.template.name == "es_result":
-            level_symbol = str(fact["level"])
-            triggered_rule = str(fact["rule"])
-            break
+    # 2–3. 分类只依赖 overall，直接查阈值表
+    level_symbol, triggered_rule = _classify(overall)
 
     # 4. 映射成可读的 stress level 文本
     symbol_to_label = {
@@ -185,7 +145,7 @@ def diagnose():
         "study_load": study_load,
     }
 
-    # 调用 CLIPSpy + 规则推理
+    # 调用规则推理
     stress_level, advice, overall, stress_scores, triggered_rule = run_inference_with_clips(responses)
 
     # 把结果传给 result.html
@@ -0,0 +1,19 @@
+"""POST /assess 冒烟测试：pytest test_assess.py 或直接 python test_assess.py"""
+from project import app
+
+
+def test_assess_smoke():
+    client = app.test_client()
+    resp = client.post('/assess', json={
+        'name': 'smoke',
+        'responses': {'anxiety_level': 4, 'depression': 4, 'sleep_quality': 2},
+    })
+    assert resp.status_code == 200, resp.data
+    data = resp.get_json()
+    assert data['name'] == 'smoke'
+    assert data['final_stress']
+
+
+if __name__ == '__main__':
+    test_assess_smoke()
+    print('ok')